@@ -7,12 +7,40 @@ import time
 import datetime
 import re
 import os
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 文件名中不允许出现的字符
+INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# 定位评论滚动容器
+FIND_CONTAINER_JS = """
+    var allDivs = document.querySelectorAll('div');
+    for (var j = 0; j < allDivs.length; j++) {
+        var div = allDivs[j];
+        if (div.scrollHeight > div.clientHeight + 50 && 
+            (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
+            window.__commentContainer = div;
+            break;
+        }
+    }
+"""
+SCROLL_JS = "var c = window.__commentContainer; if(c) c.scrollTop += 2000; else window.scrollBy(0, 2000);"
 
 class DouyinCommentCrawler:
+    FIELDNAMES = (
+        '评论ID', '昵称', '用户ID', '用户sec_id', '头像', '地区', '时间', 
+        '评论', '点赞数', '回复数', '回复给用户', '回复给用户ID', 
+        '是否置顶', '是否热评', '包含话题', '提及用户'
+    )
+    
     def __init__(self, video_url):
         self.video_url = video_url
         self.driver = None
-        self.comments = []
+        # 只记ID，用于去重和计数
+        self.comment_ids = set()
     
     def get_video_title(self):
         """提取视频标题"""
@@ -22,32 +50,57 @@ class DouyinCommentCrawler:
                            document.title || '未知视频';
                 return title.replace(/\s*[-–—|]\s*抖音.*$/, '').trim();
             """)
-            title = re.sub(r'[<>:"/\\|?*]', '_', title)
+            title = INVALID_FILENAME_RE.sub('_', title)
             return title[:50] if title else '未知视频'
         except:
             return '未知视频'
     
+    def get_comments(self, resp):
+        """取出数据包里的评论列表，装了orjson时直接解析原始body"""
+        if orjson is not None:
+            try:
+                return orjson.loads(resp.response.raw_body).get('comments') or []
+            except:
+                pass
+        return resp.response.body.get('comments') or []
+    
     def parse_comment(self, comment):
-        """解析评论数据"""
-        user = comment.get('user', {})
-        return {
-            '评论ID': comment.get('cid', ''),
-            '昵称': user.get('nickname', ''),
-            '用户ID': user.get('uid', ''),
-            '用户sec_id': user.get('sec_uid', ''),
-            '头像': user.get('avatar_thumb', {}).get('url_list', [''])[0],
-            '地区': comment.get('ip_label', ''),
-            '时间': str(datetime.datetime.fromtimestamp(comment.get('create_time', 0))),
-            '评论': comment.get('text', '').strip(),
-            '点赞数': comment.get('digg_count', 0),
-            '回复数': comment.get('reply_comment_total', 0),
-            '回复给用户': comment.get('reply_to_username', ''),
-            '回复给用户ID': comment.get('reply_to_userid', ''),
-            '是否置顶': '是' if comment.get('stick_position', 0) > 0 else '否',
-            '是否热评': '是' if comment.get('user_digged', 0) > 0 else '否',
-            '包含话题': '',
-            '提及用户': ''
-        }
+        """解析评论数据，返回一行CSV"""
+        get = comment.get
+        user = get('user', {})
+        # 按FIELDNAMES的列顺序返回一行
+        return (
+            get('cid', ''),  # 评论ID
+            user.get('nickname', ''),  # 昵称
+            user.get('uid', ''),  # 用户ID
+            user.get('sec_uid', ''),  # 用户sec_id
+            user.get('avatar_thumb', {}).get('url_list', [''])[0],  # 头像
+            get('ip_label', ''),  # 地区
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(get('create_time', 0))),  # 时间
+            get('text', '').strip(),  # 评论
+            get('digg_count', 0),  # 点赞数
+            get('reply_comment_total', 0),  # 回复数
+            get('reply_to_username', ''),  # 回复给用户
+            get('reply_to_userid', ''),  # 回复给用户ID
+            '是' if get('stick_position', 0) > 0 else '否',  # 是否置顶
+            '是' if get('user_digged', 0) > 0 else '否',  # 是否热评
+            '',  # 包含话题
+            '',  # 提及用户
+        )
+    
+    def _write_new(self, resp, writer):
+        """写出数据包里未见过的评论"""
+        rows = []
+        try:
+            for comment in self.get_comments(resp):
+                cid = str(comment.get('cid', ''))
+                cid = int(cid) if cid.isdigit() else cid
+                if cid not in self.comment_ids:
+                    rows.append(self.parse_comment(comment))
+                    self.comment_ids.add(cid)
+        except:
+            pass
+        writer.writerows(rows)
     
     def start(self, need_login=True):
         """开始爬取"""
@@ -69,67 +122,37 @@ class DouyinCommentCrawler:
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = f'crawled_comments/{video_title}_{timestamp}.csv'
         
-        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                '评论ID', '昵称', '用户ID', '用户sec_id', '头像', '地区', '时间', 
-                '评论', '点赞数', '回复数', '回复给用户', '回复给用户ID', 
-                '是否置顶', '是否热评', '包含话题', '提及用户'
-            ])
-            writer.writeheader()
+        with open(output_file, 'w', encoding='utf-8-sig', newline='', buffering=1 << 16) as f:
+            writer = csv.writer(f)
+            writer.writerow(self.FIELDNAMES)
             
             print("滚动并监听API...")
+            self.driver.run_js(FIND_CONTAINER_JS)
             for i in range(200):
-                if i == 0:
-                    self.driver.run_js("""
-                        var allDivs = document.querySelectorAll('div');
-                        for (var j = 0; j < allDivs.length; j++) {
-                            var div = allDivs[j];
-                            if (div.scrollHeight > div.clientHeight + 50 && 
-                                (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
-                                window.__commentContainer = div;
-                                break;
-                            }
-                        }
-                    """)
-                
-                self.driver.run_js("var c = window.__commentContainer; if(c) c.scrollTop += 2000; else window.scrollBy(0, 2000);")
+                self.driver.run_js(SCROLL_JS)
                 
                 if (i + 1) % 50 == 0:
-                    print(f"已获取 {len(self.comments)} 条")
-                
-                time.sleep(0.3)
+                    print(f"已获取 {len(self.comment_ids)} 条")
                 
+                # 第一个包最多等0.4秒，到了就处理
+                timeout = 0.4
                 while True:
-                    resp = self.driver.listen.wait(timeout=0.1)
+                    resp = self.driver.listen.wait(timeout=timeout)
                     if not resp:
                         break
-                    try:
-                        for comment in resp.response.body.get('comments', []):
-                            parsed = self.parse_comment(comment)
-                            if parsed['评论ID'] not in [c['评论ID'] for c in self.comments]:
-                                self.comments.append(parsed)
-                                writer.writerow(parsed)
-                    except:
-                        pass
+                    timeout = 0.1
+                    self._write_new(resp, writer)
             
-            time.sleep(2)
-            for _ in range(10):
-                resp = self.driver.listen.wait(timeout=1)
+            for i in range(10):
+                resp = self.driver.listen.wait(timeout=3 if i == 0 else 1)
                 if not resp:
                     break
-                try:
-                    for comment in resp.response.body.get('comments', []):
-                        parsed = self.parse_comment(comment)
-                        if parsed['评论ID'] not in [c['评论ID'] for c in self.comments]:
-                            self.comments.append(parsed)
-                            writer.writerow(parsed)
-                except:
-                    pass
+                self._write_new(resp, writer)
         
         self.driver.quit()
-        print(f"完成！共 {len(self.comments)} 条评论")
+        print(f"完成！共 {len(self.comment_ids)} 条评论")
         print(f"保存: {output_file}")
-        return output_file, len(self.comments)
+        return output_file, len(self.comment_ids)
 
 if __name__ == '__main__':
     url = input("视频URL: ").strip() or "https://www.douyin.com/video/7587571141704043825"
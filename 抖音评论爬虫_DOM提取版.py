@@ -5,9 +5,137 @@ from DrissionPage import ChromiumPage
 import csv
 import time
 import datetime
-import msvcrt
 import os
 import re
+import sys
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import select
+
+# 文件名中不允许出现的字符
+INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# 定位评论滚动容器并聚焦
+FIND_CONTAINER_JS = """
+    var allDivs = document.querySelectorAll('div');
+    for (var i = 0; i < allDivs.length; i++) {
+        var div = allDivs[i];
+        if (div.scrollHeight > div.clientHeight + 50 && 
+            (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
+            div.setAttribute('tabindex', '-1');
+            div.focus();
+            window.__commentContainer = div;
+            break;
+        }
+    }
+"""
+
+# 滚动评论容器，返回[高度, 是否到底]
+SCROLL_JS = "var c = window.__commentContainer; if(c) { c.scrollTop += 2000; return [c.scrollHeight, c.scrollTop + c.clientHeight >= c.scrollHeight - 1]; } return [0, true];"
+
+# 从页面中提取已加载的评论
+EXTRACT_JS = """
+    // 查找评论元素
+    var commentItems = document.querySelectorAll('[data-e2e="comment-item"]');
+    var infoWraps = document.querySelectorAll('[class*="comment-item-info-wrap"]');
+
+    if (infoWraps.length > commentItems.length) {
+        var parentSet = new Set();
+        infoWraps.forEach(function(wrap) {
+            var parent = wrap.parentElement;
+            if (parent && parent.parentElement) {
+                parentSet.add(parent.parentElement);
+            }
+        });
+        commentItems = Array.from(parentSet);
+    }
+
+    var comments = [];
+    var processedIds = new Set();
+
+    commentItems.forEach(function(item, index) {
+        try {
+            var commentId = item.getAttribute('data-id') || 'comment_' + index;
+            if (processedIds.has(commentId)) return;
+            processedIds.add(commentId);
+
+            // 昵称
+            var nicknameEl = item.querySelector('span.arnSiSbK.xtTwhlGw');
+            var nickname = nicknameEl ? nicknameEl.textContent.trim() : '';
+
+            // 用户链接
+            var userLinkEl = item.querySelector('a.uz1VJwFY');
+            var userLink = userLinkEl ? userLinkEl.getAttribute('href') : '';
+            if (userLink && userLink.startsWith('//')) userLink = 'https:' + userLink;
+
+            // 评论内容（100%可靠方法）
+            var content = '';
+            var contentEl = item.querySelector('span.WFJiGxr7') || 
+                           (item.querySelector('div.C7LroK_h') || {}).querySelector('span');
+            if (contentEl) content = contentEl.textContent.trim();
+            if (!content) return;
+
+            // 时间和地区
+            var timeText = '', ipLabel = '';
+            var timeIpEl = item.querySelector('div.fJhvAqos span');
+            if (timeIpEl) {
+                var timeIpText = timeIpEl.textContent.trim();
+                if (timeIpText.includes('·')) {
+                    var parts = timeIpText.split('·');
+                    timeText = parts[0].trim();
+                    ipLabel = parts[1].trim();
+                } else {
+                    timeText = timeIpText;
+                }
+            }
+
+            // 点赞数
+            var likeEl = item.querySelector('p.xZhLomAs span');
+            var likeCount = '0';
+            if (likeEl) {
+                var match = likeEl.textContent.trim().match(/\\d+/);
+                likeCount = match ? match[0] : '0';
+            }
+
+            // 回复数
+            var replyEl = item.querySelector('div.f8nOLNQF span');
+            var replyCount = 0;
+            if (replyEl) {
+                var match = replyEl.textContent.trim().match(/\\d+/);
+                replyCount = match ? parseInt(match[0]) : 0;
+            }
+
+            comments.push({
+                commentId: commentId,
+                nickname: nickname,
+                userLink: userLink,
+                content: content,
+                time: timeText,
+                ip: ipLabel,
+                likes: likeCount,
+                replies: replyCount
+            });
+        } catch (e) {}
+    });
+
+    return comments;
+"""
+
+def wait_enter(timeout):
+    """最多等timeout秒，按下Enter立即返回True，超时返回False"""
+    if msvcrt is None:
+        if select.select([sys.stdin], [], [], timeout)[0]:
+            sys.stdin.readline()
+            return True
+        return False
+    end = time.time() + timeout
+    while time.time() < end:
+        if msvcrt.kbhit() and msvcrt.getch() == b'\r':
+            return True
+        time.sleep(0.05)
+    return False
 
 class DouyinCommentCrawler:
     def __init__(self, video_url):
@@ -22,121 +150,33 @@ class DouyinCommentCrawler:
                            document.title || '未知视频';
                 return title.replace(/\s*[-–—|]\s*抖音.*$/, '').trim();
             """)
-            title = re.sub(r'[<>:"/\\|?*]', '_', title)
+            title = INVALID_FILENAME_RE.sub('_', title)
             return title[:50] if title else '未知视频'
         except:
             return '未知视频'
     
     def scroll_comments(self):
         """滚动加载评论"""
-        self.driver.run_js("""
-            var allDivs = document.querySelectorAll('div');
-            for (var i = 0; i < allDivs.length; i++) {
-                var div = allDivs[i];
-                if (div.scrollHeight > div.clientHeight + 50 && 
-                    (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
-                    div.setAttribute('tabindex', '-1');
-                    div.focus();
-                    window.__commentContainer = div;
-                    break;
-                }
-            }
-        """)
+        self.driver.run_js(FIND_CONTAINER_JS)
         
         print("滚动加载中...")
+        last_height, stalls = 0, 0
         for i in range(200):
-            self.driver.run_js("var c = window.__commentContainer; if(c) c.scrollTop += 2000;")
+            height, at_bottom = self.driver.run_js(SCROLL_JS)
+            # 到底且3秒内高度不再增长，视为加载完
+            if at_bottom and height == last_height:
+                stalls += 1
+                if stalls >= 15:
+                    break
+            else:
+                stalls = 0
+            last_height = height
             time.sleep(0.2)
         time.sleep(2)
     
     def extract_comments(self):
         """提取评论"""
-        comments = self.driver.run_js("""
-            // 查找评论元素
-            var commentItems = document.querySelectorAll('[data-e2e="comment-item"]');
-            var infoWraps = document.querySelectorAll('[class*="comment-item-info-wrap"]');
-            
-            if (infoWraps.length > commentItems.length) {
-                var parentSet = new Set();
-                infoWraps.forEach(function(wrap) {
-                    var parent = wrap.parentElement;
-                    if (parent && parent.parentElement) {
-                        parentSet.add(parent.parentElement);
-                    }
-                });
-                commentItems = Array.from(parentSet);
-            }
-            
-            var comments = [];
-            var processedIds = new Set();
-            
-            commentItems.forEach(function(item, index) {
-                try {
-                    var commentId = item.getAttribute('data-id') || 'comment_' + index;
-                    if (processedIds.has(commentId)) return;
-                    processedIds.add(commentId);
-                    
-                    // 昵称
-                    var nicknameEl = item.querySelector('span.arnSiSbK.xtTwhlGw');
-                    var nickname = nicknameEl ? nicknameEl.textContent.trim() : '';
-                    
-                    // 用户链接
-                    var userLinkEl = item.querySelector('a.uz1VJwFY');
-                    var userLink = userLinkEl ? userLinkEl.getAttribute('href') : '';
-                    if (userLink && userLink.startsWith('//')) userLink = 'https:' + userLink;
-                    
-                    // 评论内容（100%可靠方法）
-                    var content = '';
-                    var contentEl = item.querySelector('span.WFJiGxr7') || 
-                                   (item.querySelector('div.C7LroK_h') || {}).querySelector('span');
-                    if (contentEl) content = contentEl.textContent.trim();
-                    if (!content) return;
-                    
-                    // 时间和地区
-                    var timeText = '', ipLabel = '';
-                    var timeIpEl = item.querySelector('div.fJhvAqos span');
-                    if (timeIpEl) {
-                        var timeIpText = timeIpEl.textContent.trim();
-                        if (timeIpText.includes('·')) {
-                            var parts = timeIpText.split('·');
-                            timeText = parts[0].trim();
-                            ipLabel = parts[1].trim();
-                        } else {
-                            timeText = timeIpText;
-                        }
-                    }
-                    
-                    // 点赞数
-                    var likeEl = item.querySelector('p.xZhLomAs span');
-                    var likeCount = '0';
-                    if (likeEl) {
-                        var match = likeEl.textContent.trim().match(/\\d+/);
-                        likeCount = match ? match[0] : '0';
-                    }
-                    
-                    // 回复数
-                    var replyEl = item.querySelector('div.f8nOLNQF span');
-                    var replyCount = 0;
-                    if (replyEl) {
-                        var match = replyEl.textContent.trim().match(/\\d+/);
-                        replyCount = match ? parseInt(match[0]) : 0;
-                    }
-                    
-                    comments.push({
-                        commentId: commentId,
-                        nickname: nickname,
-                        userLink: userLink,
-                        content: content,
-                        time: timeText,
-                        ip: ipLabel,
-                        likes: likeCount,
-                        replies: replyCount
-                    });
-                } catch (e) {}
-            });
-            
-            return comments;
-        """)
+        comments = self.driver.run_js(EXTRACT_JS)
         
         print(f"提取到 {len(comments)} 条评论")
         return comments
@@ -159,9 +199,8 @@ class DouyinCommentCrawler:
                         break
                 except:
                     pass
-                if msvcrt.kbhit() and msvcrt.getch() == b'\r':
+                if wait_enter(0.5):
                     break
-                time.sleep(0.5)
         
         print(f"访问: {self.video_url}")
         self.driver.get(self.video_url)
@@ -176,7 +215,7 @@ class DouyinCommentCrawler:
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = f'crawled_comments/{video_title}_{timestamp}.csv'
         
-        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+        with open(output_file, 'w', encoding='utf-8-sig', newline='', buffering=1 << 16) as f:
             writer = csv.DictWriter(f, fieldnames=[
                 '评论ID', '昵称', '用户ID', '用户sec_id', '头像', '地区', '时间', 
                 '评论', '点赞数', '回复数', '回复给用户', '回复给用户ID', 
@@ -184,25 +223,24 @@ class DouyinCommentCrawler:
             ])
             writer.writeheader()
             
-            for comment in comments:
-                writer.writerow({
-                    '评论ID': comment.get('commentId', ''),
-                    '昵称': comment.get('nickname', ''),
-                    '用户ID': '',
-                    '用户sec_id': '',
-                    '头像': comment.get('userLink', ''),
-                    '地区': comment.get('ip', ''),
-                    '时间': comment.get('time', ''),
-                    '评论': comment.get('content', ''),
-                    '点赞数': comment.get('likes', '0'),
-                    '回复数': comment.get('replies', '0'),
-                    '回复给用户': '',
-                    '回复给用户ID': '',
-                    '是否置顶': '否',
-                    '是否热评': '否',
-                    '包含话题': '',
-                    '提及用户': ''
-                })
+            writer.writerows({
+                '评论ID': comment.get('commentId', ''),
+                '昵称': comment.get('nickname', ''),
+                '用户ID': '',
+                '用户sec_id': '',
+                '头像': comment.get('userLink', ''),
+                '地区': comment.get('ip', ''),
+                '时间': comment.get('time', ''),
+                '评论': comment.get('content', ''),
+                '点赞数': comment.get('likes', '0'),
+                '回复数': comment.get('replies', '0'),
+                '回复给用户': '',
+                '回复给用户ID': '',
+                '是否置顶': '否',
+                '是否热评': '否',
+                '包含话题': '',
+                '提及用户': ''
+            } for comment in comments)
         
         self.driver.quit()
         print(f"完成！保存: {output_file}")
@@ -8,6 +8,101 @@ import os
 import re
 from datetime import datetime
 
+# 文件名中不允许出现的字符
+INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# 定位评论滚动容器
+FIND_CONTAINER_JS = """
+    var allDivs = document.querySelectorAll('div');
+    for (var i = 0; i < allDivs.length; i++) {
+        var div = allDivs[i];
+        if (div.scrollHeight > div.clientHeight + 50 && 
+            (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
+            window.__commentContainer = div;
+            break;
+        }
+    }
+"""
+
+# 滚动评论容器，返回[高度, 是否到底]
+SCROLL_JS = "var c = window.__commentContainer; if(c) { c.scrollTop += 2000; return [c.scrollHeight, c.scrollTop + c.clientHeight >= c.scrollHeight - 1]; } return [0, true];"
+
+# 从页面中提取已加载的评论
+EXTRACT_JS = """
+    var commentItems = document.querySelectorAll('[data-e2e="comment-item"]');
+    var infoWraps = document.querySelectorAll('[class*="comment-item-info-wrap"]');
+
+    if (infoWraps.length > commentItems.length) {
+        var parentSet = new Set();
+        infoWraps.forEach(function(wrap) {
+            if (wrap.parentElement && wrap.parentElement.parentElement) {
+                parentSet.add(wrap.parentElement.parentElement);
+            }
+        });
+        commentItems = Array.from(parentSet);
+    }
+
+    var comments = [];
+    commentItems.forEach(function(item, index) {
+        try {
+            var id = item.getAttribute('data-id') || 'comment_' + index;
+            var nickname = (item.querySelector('span.arnSiSbK.xtTwhlGw') || {}).textContent || '';
+
+            // 评论内容（100%可靠方法）
+            var content = '';
+            var contentEl = item.querySelector('span.WFJiGxr7') || 
+                           (item.querySelector('div.C7LroK_h') || {}).querySelector('span');
+            if (contentEl) content = contentEl.textContent.trim();
+            if (!content) return;
+
+            var timeIpEl = item.querySelector('div.fJhvAqos span');
+            var timeText = '', ipLabel = '';
+            if (timeIpEl) {
+                var parts = timeIpEl.textContent.trim().split('·');
+                timeText = parts[0] || '';
+                ipLabel = parts[1] || '';
+            }
+
+            var likeEl = item.querySelector('p.xZhLomAs span');
+            var likes = likeEl ? (likeEl.textContent.match(/\\d+/) || ['0'])[0] : '0';
+
+            var replyEl = item.querySelector('div.f8nOLNQF span');
+            var replies = replyEl ? parseInt((replyEl.textContent.match(/\\d+/) || ['0'])[0]) : 0;
+
+            comments.push({
+                id: id,
+                nickname: nickname,
+                content: content,
+                time: timeText,
+                ip: ipLabel,
+                likes: likes,
+                replies: replies,
+                level: 1
+            });
+        } catch (e) {}
+    });
+
+    return comments;
+"""
+
+# 点击"展开N条回复"，最多arguments[0]个
+EXPAND_REPLIES_JS = """
+    var clicked = 0;
+    var allElements = document.querySelectorAll('div, span, button');
+
+    for (var i = 0; i < allElements.length && clicked < arguments[0]; i++) {
+        var text = allElements[i].textContent.trim();
+        if (text.match(/展开\\d+条回复/) && !text.match(/已展开/)) {
+            try {
+                allElements[i].click();
+                clicked++;
+            } catch(e) {}
+        }
+    }
+
+    return clicked;
+"""
+
 class DouyinCommentCrawlerWithReplies:
     def __init__(self, video_url):
         self.video_url = video_url
@@ -21,108 +116,37 @@ class DouyinCommentCrawlerWithReplies:
                            document.title || '未知视频';
                 return title.replace(/\s*[-–—|]\s*抖音.*$/, '').trim();
             """)
-            title = re.sub(r'[<>:"/\\|?*]', '_', title)
+            title = INVALID_FILENAME_RE.sub('_', title)
             return title[:50] if title else '未知视频'
         except:
             return '未知视频'
     
     def scroll_comments(self):
         """滚动加载评论"""
-        self.driver.run_js("""
-            var allDivs = document.querySelectorAll('div');
-            for (var i = 0; i < allDivs.length; i++) {
-                var div = allDivs[i];
-                if (div.scrollHeight > div.clientHeight + 50 && 
-                    (div.innerHTML.includes('评论') || div.className.includes('comment'))) {
-                    window.__commentContainer = div;
-                    break;
-                }
-            }
-        """)
+        self.driver.run_js(FIND_CONTAINER_JS)
         
         print("滚动加载...")
+        last_height, stalls = 0, 0
         for i in range(200):
-            self.driver.run_js("var c = window.__commentContainer; if(c) c.scrollTop += 2000;")
+            height, at_bottom = self.driver.run_js(SCROLL_JS)
+            # 到底且3秒内高度不再增长，视为加载完
+            if at_bottom and height == last_height:
+                stalls += 1
+                if stalls >= 15:
+                    break
+            else:
+                stalls = 0
+            last_height = height
             time.sleep(0.2)
         time.sleep(2)
     
     def extract_comments(self):
         """提取评论"""
-        return self.driver.run_js("""
-            var commentItems = document.querySelectorAll('[data-e2e="comment-item"]');
-            var infoWraps = document.querySelectorAll('[class*="comment-item-info-wrap"]');
-            
-            if (infoWraps.length > commentItems.length) {
-                var parentSet = new Set();
-                infoWraps.forEach(function(wrap) {
-                    if (wrap.parentElement && wrap.parentElement.parentElement) {
-                        parentSet.add(wrap.parentElement.parentElement);
-                    }
-                });
-                commentItems = Array.from(parentSet);
-            }
-            
-            var comments = [];
-            commentItems.forEach(function(item, index) {
-                try {
-                    var id = item.getAttribute('data-id') || 'comment_' + index;
-                    var nickname = (item.querySelector('span.arnSiSbK.xtTwhlGw') || {}).textContent || '';
-                    
-                    // 评论内容（100%可靠方法）
-                    var content = '';
-                    var contentEl = item.querySelector('span.WFJiGxr7') || 
-                                   (item.querySelector('div.C7LroK_h') || {}).querySelector('span');
-                    if (contentEl) content = contentEl.textContent.trim();
-                    if (!content) return;
-                    
-                    var timeIpEl = item.querySelector('div.fJhvAqos span');
-                    var timeText = '', ipLabel = '';
-                    if (timeIpEl) {
-                        var parts = timeIpEl.textContent.trim().split('·');
-                        timeText = parts[0] || '';
-                        ipLabel = parts[1] || '';
-                    }
-                    
-                    var likeEl = item.querySelector('p.xZhLomAs span');
-                    var likes = likeEl ? (likeEl.textContent.match(/\\d+/) || ['0'])[0] : '0';
-                    
-                    var replyEl = item.querySelector('div.f8nOLNQF span');
-                    var replies = replyEl ? parseInt((replyEl.textContent.match(/\\d+/) || ['0'])[0]) : 0;
-                    
-                    comments.push({
-                        id: id,
-                        nickname: nickname,
-                        content: content,
-                        time: timeText,
-                        ip: ipLabel,
-                        likes: likes,
-                        replies: replies,
-                        level: 1
-                    });
-                } catch (e) {}
-            });
-            
-            return comments;
-        """)
+        return self.driver.run_js(EXTRACT_JS)
     
     def expand_replies(self, max_expand, primary_ids):
         """展开并提取回复"""
-        result = self.driver.run_js(f"""
-            var clicked = 0;
-            var allElements = document.querySelectorAll('div, span, button');
-            
-            for (var i = 0; i < allElements.length && clicked < {max_expand}; i++) {{
-                var text = allElements[i].textContent.trim();
-                if (text.match(/展开\\d+条回复/) && !text.match(/已展开/)) {{
-                    try {{
-                        allElements[i].click();
-                        clicked++;
-                    }} catch(e) {{}}
-                }}
-            }}
-            
-            return clicked;
-        """)
+        result = self.driver.run_js(EXPAND_REPLIES_JS, max_expand)
         
         print(f"展开了 {result} 个回复")
         if result > 0:
@@ -140,22 +164,21 @@ class DouyinCommentCrawlerWithReplies:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = f'crawled_comments/{video_title}_{timestamp}_with_replies.csv'
         
-        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+        with open(output_file, 'w', encoding='utf-8-sig', newline='', buffering=1 << 16) as f:
             writer = csv.DictWriter(f, fieldnames=[
                 '评论ID', '层级', '昵称', '地区', '时间', '评论内容', '点赞数', '回复数'
             ])
             writer.writeheader()
-            for c in comments:
-                writer.writerow({
-                    '评论ID': c['id'],
-                    '层级': c['level'],
-                    '昵称': c['nickname'],
-                    '地区': c['ip'],
-                    '时间': c['time'],
-                    '评论内容': c['content'],
-                    '点赞数': c['likes'],
-                    '回复数': c['replies']
-                })
+            writer.writerows({
+                '评论ID': c['id'],
+                '层级': c['level'],
+                '昵称': c['nickname'],
+                '地区': c['ip'],
+                '时间': c['time'],
+                '评论内容': c['content'],
+                '点赞数': c['likes'],
+                '回复数': c['replies']
+            } for c in comments)
         
         return output_file
     